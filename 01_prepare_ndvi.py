@@ -7,23 +7,34 @@ Ele é responsável por limpar e preparar os dados de NDVI (Normalized Differenc
 
 Passos executados:
 1.  Carrega o arquivo de dados brutos de NDVI ('NDVI_Municipios_unico.csv').
-2.  Extrai e limpa os nomes dos municípios a partir de uma string complexa.
-3.  Filtra os dados para manter apenas os municípios de interesse para a análise.
-4.  Salva o resultado em um novo arquivo CSV ('NDVI_Municipios_filtrado.csv'), pronto para ser usado nas próximas etapas.
+2.  Filtra os dados para manter apenas os municípios de interesse para a análise.
+3.  Extrai e limpa os nomes dos municípios a partir de uma string complexa.
+4.  Salva o resultado em um novo arquivo Parquet ('ndvi_filtrado.parquet'), pronto para ser usado nas próximas etapas.
 """
 import pandas as pd
+import pyarrow as pa
 import logging
+from log_setup import setup as setup_logging
 import os
+import re
+from io_utils import CATEGORY, load_csv
 
 # Configuração do logging para registrar informações sobre a execução
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
+
+# Padrão para extrair o nome do município da string bruta
+# Ex: "api_Municipios — camada_unida_Pinhal_de_São_Bento_1_1" -> "Pinhal_de_São_Bento"
+MUNICIPIO_PATTERN = re.compile(r'unida_(.+?)_\d+_\d+')
+
+def clean_municipio_name(raw):
+    """
+    Extrai e limpa o nome do município de uma string bruta.
+    Se o padrão não for encontrado, usa o valor original como fallback.
+    Ex: "api_Municipios — camada_unida_Pinhal_de_São_Bento_1_1" -> "Pinhal de São Bento"
+    """
+    match = MUNICIPIO_PATTERN.search(raw)
+    nome = match.group(1) if match else raw
+    return nome.replace('_', ' ').strip()
 
 def prepare_ndvi_data(input_path, output_path, municipios_interesse):
     """
@@ -31,51 +42,54 @@ def prepare_ndvi_data(input_path, output_path, municipios_interesse):
 
     Args:
         input_path (str): Caminho para o arquivo CSV de entrada.
-        output_path (str): Caminho para salvar o arquivo CSV processado.
+        output_path (str): Caminho para salvar o arquivo Parquet processado.
         municipios_interesse (list): Lista de nomes de municípios a serem mantidos.
     """
     logging.info("Iniciando a preparação dos dados de NDVI...")
 
-    try:
-        df = pd.read_csv(input_path)
-        logging.info(f"Arquivo {input_path} carregado com {len(df)} linhas.")
-    except FileNotFoundError:
-        logging.error(f"Arquivo de entrada não encontrado em: {input_path}")
-        return
-
-    # 1. Extrair nome do município da coluna 'municipio'
-    # Ex: "api_Municipios — camada_unida_Pinhal_de_São_Bento_1_1" -> "Pinhal_de_São_Bento"
-    df['municipio_raw'] = df['municipio'].str.extract(
-        r'unida_(.+?)_\d+_\d+',
-        expand=False
-    )
-
-    # Se o padrão não for encontrado, usa o valor original como fallback
-    df['municipio_raw'] = df['municipio_raw'].fillna(df['municipio'])
-
-    # 2. Limpar o nome do município (trocar "_" por espaço)
-    # Ex: "Pinhal_de_São_Bento" -> "Pinhal de São Bento"
-    df['municipio_nome'] = (
-        df['municipio_raw']
-        .str.replace('_', ' ', regex=False)
-        .str.strip()
+    # Apenas as colunas usadas, com tipos explícitos para evitar a inferência do pandas.
+    # 'municipio' tem poucos valores distintos, então é lida como categórica.
+    df = load_csv(
+        input_path,
+        schema={'data': pa.string(), 'valor': pa.float64(), 'municipio': CATEGORY},
+        usecols=['data', 'valor', 'municipio']
     )
+    if df is None:
+        return
 
-    # 3. Filtrar pelos municípios de interesse
-    df_filtrado = df[df['municipio_nome'].isin(municipios_interesse)].copy()
+    # Conjunto imutável para testes de pertinência O(1)
+    municipios_set = frozenset(municipios_interesse)
+
+    # 1. Pré-filtrar os valores brutos que podem conter algum município de interesse
+    # Os nomes aparecem com "_" no lugar de espaços, então o padrão aceita ambos.
+    # A coluna possui poucos valores distintos repetidos ao longo das datas, então
+    # o filtro e o regex de extração rodam uma vez por valor único.
+    interesse_pattern = re.compile('|'.join(
+        '[_ ]'.join(re.escape(parte) for parte in m.split())
+        for m in municipios_set
+    ))
+    candidatos = [raw for raw in df['municipio'].dropna().unique() if interesse_pattern.search(raw)]
+
+    # 2. Extrair e limpar o nome do município apenas para os candidatos
+    # e manter somente os que correspondem exatamente a um município de interesse
+    nomes = {raw: clean_municipio_name(raw) for raw in candidatos}
+    nomes = {raw: nome for raw, nome in nomes.items() if nome in municipios_set}
+
+    df_filtrado = df[df['municipio'].isin(frozenset(nomes))].copy()
     logging.info(f"Filtragem por municípios de interesse resultou em {len(df_filtrado)} linhas.")
 
     if df_filtrado.empty:
         logging.warning("Nenhum município de interesse foi encontrado no arquivo de NDVI. O arquivo de saída estará vazio.")
 
-    # 4. Definir a coluna final 'municipio' e selecionar colunas
-    df_filtrado['municipio'] = df_filtrado['municipio_nome']
+    # 3. Definir a coluna final 'municipio', converter a data e selecionar colunas
+    df_filtrado['municipio'] = df_filtrado['municipio'].map(nomes)
+    df_filtrado['data'] = pd.to_datetime(df_filtrado['data'], errors='coerce')
     df_final = df_filtrado[['data', 'valor', 'municipio']]
 
-    # 5. Salvar o arquivo processado
+    # 4. Salvar o arquivo processado
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_final.to_csv(output_path, index=False, float_format='%.4f')
+        df_final.to_parquet(output_path, compression='zstd', index=False)
         logging.info(f"Dados de NDVI preparados e salvos em: {output_path}")
     except Exception as e:
         logging.error(f"Falha ao salvar o arquivo em {output_path}: {e}")
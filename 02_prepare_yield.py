@@ -7,26 +7,26 @@ Ele é responsável por carregar os dados de produção de soja e calcular a pro
 
 Passos executados:
 1.  Carrega o arquivo de dados de produção ('soja_por_ano_municipio_area.csv').
-2.  Converte as colunas 'PRODUCAO' (toneladas) e 'AREA TOTAL' (hectares) para formato numérico.
+2.  Converte as colunas 'PRODUCAO' (toneladas) e 'AREA TOTAL' (hectares) para formato numérico
+    já na leitura (vírgula como separador decimal).
 3.  Calcula a produtividade (YIELD) em sacas por hectare.
     - Fator de conversão: 1 tonelada = 1000 kg; 1 saca = 60 kg.
     - Fórmula: YIELD = (PRODUCAO_ton * 1000 / 60) / AREA_ha
 4.  Renomeia e seleciona as colunas finais.
-5.  Salva o resultado em um novo arquivo CSV ('soja_produtividade_calculada.csv').
+5.  Salva o resultado em um novo arquivo Parquet ('yield_calculado.parquet').
 """
 import pandas as pd
+import pyarrow as pa
 import logging
+from log_setup import setup as setup_logging
 import os
+from io_utils import load_csv
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
+
+# Colunas necessárias do arquivo de produção
+REQUIRED_COLS = ["PRODUCAO", "AREA TOTAL", "Município", "SAFRA", "REGIAO"]
 
 def prepare_yield_data(input_path, output_path):
     """
@@ -34,29 +34,34 @@ def prepare_yield_data(input_path, output_path):
 
     Args:
         input_path (str): Caminho para o arquivo CSV de entrada.
-        output_path (str): Caminho para salvar o arquivo CSV processado.
+        output_path (str): Caminho para salvar o arquivo Parquet processado.
     """
     logging.info("Iniciando a preparação dos dados de produtividade...")
 
-    try:
-        df = pd.read_csv(input_path)
-        logging.info(f"Arquivo {input_path} carregado com {len(df)} linhas.")
-    except FileNotFoundError:
-        logging.error(f"Arquivo de entrada não encontrado em: {input_path}")
+    # Ler apenas as colunas necessárias, com tipos explícitos para os identificadores.
+    # Colunas ausentes não geram erro na leitura (são validadas abaixo).
+    # Os valores numéricos usam vírgula como separador decimal (ex: "39462,5")
+    # e são convertidos diretamente na leitura.
+    df = load_csv(
+        input_path,
+        schema={'Município': pa.string(), 'SAFRA': pa.string(), 'REGIAO': pa.string()},
+        usecols=REQUIRED_COLS,
+        decimal_point=','
+    )
+    if df is None:
         return
 
     # Validar a existência das colunas necessárias
-    required_cols = ["PRODUCAO", "AREA TOTAL", "Município", "SAFRA", "REGIAO"]
-    if not all(col in df.columns for col in required_cols):
-        missing = [col for col in required_cols if col not in df.columns]
+    if not all(col in df.columns for col in REQUIRED_COLS):
+        missing = [col for col in REQUIRED_COLS if col not in df.columns]
         logging.error(f"Colunas obrigatórias não encontradas no arquivo: {missing}")
         return
 
-    # Converter colunas para numérico, tratando vírgulas como separador decimal
+    # Se alguma coluna tiver valores não numéricos, ela não é convertida na leitura;
+    # nesse caso, forçar a conversão marcando os valores inválidos como NaN
     for col in ["PRODUCAO", "AREA TOTAL"]:
-        if df[col].dtype == 'object':
-            df[col] = df[col].str.replace(',', '.', regex=False)
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
 
     # Remover linhas onde a conversão falhou ou a área é zero
     df.dropna(subset=["PRODUCAO", "AREA TOTAL"], inplace=True)
@@ -84,7 +89,7 @@ def prepare_yield_data(input_path, output_path):
     # Salvar o arquivo processado
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_final.to_csv(output_path, index=False)
+        df_final.to_parquet(output_path, compression='zstd', index=False)
         logging.info(f"Dados de produtividade preparados e salvos em: {output_path}")
     except Exception as e:
         logging.error(f"Falha ao salvar o arquivo em {output_path}: {e}")
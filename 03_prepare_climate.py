@@ -8,24 +8,28 @@ relevante da safra da soja.
 
 Passos executados:
 1.  Carrega o arquivo de dados climáticos brutos ('clima_PR_2000-2024_clean.csv').
-2.  Remove colunas que não serão utilizadas (ex: Latitude, Longitude) e colunas totalmente nulas.
+2.  Lê apenas as colunas utilizadas (descarta ex: Latitude, Longitude) e remove colunas totalmente nulas.
 3.  Converte a coluna de data para o formato datetime.
 4.  Filtra os dados para manter apenas os meses da safra da soja (setembro a março).
-5.  Salva o resultado em um novo arquivo CSV ('clima_PR_safra_season.csv').
+5.  Salva o resultado em um novo arquivo Parquet ('clima_safra.parquet').
 """
-import pandas as pd
+import pyarrow as pa
 import logging
+from log_setup import setup as setup_logging
 import os
+from io_utils import CATEGORY, load_csv
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
+
+# Colunas numéricas dos dados climáticos e seus tipos
+CLIMATE_DTYPES = {
+    'Altitude (m)': pa.float32(), 'Tmax (°C)': pa.float32(), 'Tmin (°C)': pa.float32(),
+    'Tmed (°C)': pa.float32(), 'UR (%)': pa.float32(), 'U2 (m/s)': pa.float32(),
+    'RS (MJ/m²d)': pa.float32(), 'Chuva (mm)': pa.float32()
+}
+# Colunas mantidas do arquivo bruto (Latitude, Longitude e afins não são lidas)
+CLIMATE_USECOLS = ['Data', 'Municipio', 'Solo'] + list(CLIMATE_DTYPES)
 
 def prepare_climate_data(input_path, output_path, meses_safra):
     """
@@ -33,36 +37,38 @@ def prepare_climate_data(input_path, output_path, meses_safra):
 
     Args:
         input_path (str): Caminho para o arquivo CSV de entrada.
-        output_path (str): Caminho para salvar o arquivo CSV processado.
+        output_path (str): Caminho para salvar o arquivo Parquet processado.
         meses_safra (list): Lista de inteiros representando os meses da safra.
     """
     logging.info("Iniciando a preparação dos dados climáticos...")
 
-    try:
-        df = pd.read_csv(input_path)
-        logging.info(f"Arquivo {input_path} carregado com {len(df)} linhas.")
-    except FileNotFoundError:
-        logging.error(f"Arquivo de entrada não encontrado em: {input_peth}")
+    df = load_csv(
+        input_path,
+        schema={**CLIMATE_DTYPES, 'Municipio': CATEGORY, 'Solo': CATEGORY},
+        usecols=CLIMATE_USECOLS,
+        parse_dates=['Data']
+    )
+    if df is None:
         return
 
-    # 1. Remover colunas totalmente nulas e as de geolocalização
+    # 1. Remover colunas totalmente nulas (as de geolocalização não são lidas)
     df.dropna(axis=1, how='all', inplace=True)
-    df.drop(columns=['Latitude', 'Longitude'], errors='ignore', inplace=True)
-    logging.info("Colunas nulas e de geolocalização removidas.")
+    logging.info("Colunas nulas removidas.")
 
-    # 2. Converter a coluna de data
-    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
-    # Remover linhas onde a conversão de data falhou
+    # 2. Remover linhas onde a conversão de data (feita na leitura) falhou
     df.dropna(subset=['Data'], inplace=True)
 
+    # Padronizar o nome do município (permite filtrar na leitura da etapa 04)
+    df['Municipio'] = df['Municipio'].str.strip().astype('category')
+
     # 3. Filtrar pelos meses da safra
-    df_filtrado = df[df['Data'].dt.month.isin(meses_safra)].copy()
+    df_filtrado = df[df['Data'].dt.month.isin(frozenset(meses_safra))].copy()
     logging.info(f"Filtragem por meses da safra resultou em {len(df_filtrado)} linhas.")
 
     # 4. Salvar o arquivo processado
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_filtrado.to_csv(output_path, index=False)
+        df_filtrado.to_parquet(output_path, compression='zstd', index=False)
         logging.info(f"Dados climáticos preparados e salvos em: {output_path}")
     except Exception as e:
         logging.error(f"Falha ao salvar o arquivo em {output_path}: {e}")
@@ -8,44 +8,38 @@ juntá-los e criar os três datasets mestres para a modelagem: diário, mensal e
 
 Passos executados:
 1.  Carrega os arquivos pré-processados:
-    - 'clima_PR_safra_season.csv' (dados climáticos da safra)
-    - 'NDVI_Municipios_filtrado.csv' (dados de NDVI)
-    - 'soja_produtividade_calculada.csv' (dados de produtividade)
+    - 'clima_safra.parquet' (dados climáticos da safra)
+    - 'ndvi_filtrado.parquet' (dados de NDVI)
+    - 'yield_calculado.parquet' (dados de produtividade)
 2.  Define uma função para mapear cada data a uma 'SAFRA' (ex: '00/01').
+    - Apenas os municípios de interesse são lidos (filtro aplicado na leitura do Parquet).
 3.  Aplica o mapeamento de safra aos dataframes de clima e NDVI.
-4.  Filtra todos os datasets para garantir que apenas os municípios de interesse sejam incluídos.
+4.  Converte as chaves de junção (município, safra) para categóricas compartilhadas.
 5.  Junta os três datasets, criando uma base diária (`df_daily`).
     - O NDVI (mensal) e a produtividade (anual) são replicados para cada dia correspondente.
-6.  A partir da base diária, cria agregações para os níveis mensal e anual.
+6.  A partir da base diária, cria a agregação mensal e, a partir dela, a anual.
     - A lógica de agregação é customizada (ex: 'sum' para chuva, 'mean' para temperatura).
 7.  Salva os três datasets finais:
-    - 'master_diario.csv'
-    - 'master_mensal.csv'
-    - 'master_anual.csv'
+    - 'master_diario.parquet'
+    - 'master_mensal.parquet'
+    - 'master_anual.parquet'
 """
 import pandas as pd
+import numpy as np
 import logging
+from log_setup import setup as setup_logging
 import os
+from functools import lru_cache
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 
-def date_to_safra(d):
+@lru_cache(maxsize=512)
+def safra_from_year_month(y, m):
     """
-    Converte uma data para o formato de safra 'YY/YY+1'.
-    A safra da soja no Brasil começa no segundo semestre de um ano e termina no primeiro do ano seguinte.
-    Ex: data em 2000-10 -> safra '00/01'
-        data em 2001-01 -> safra '00/01'
+    Converte um par (ano, mês) para o formato de safra 'YY/YY+1'.
+    Há poucos pares distintos (12 meses x ~25 anos), então o resultado é memorizado.
     """
-    y = d.year
-    m = d.month
     if m >= 9:  # Setembro a Dezembro: início da safra
         ano_ini = y
     else:       # Janeiro a Março: fim da safra
@@ -53,6 +47,68 @@ def date_to_safra(d):
     ano_fim = ano_ini + 1
     return f"{ano_ini % 100:02d}/{ano_fim % 100:02d}"
 
+def date_to_safra(d):
+    """
+    Converte uma data para o formato de safra 'YY/YY+1'.
+    A safra da soja no Brasil começa no segundo semestre de um ano e termina no primeiro do ano seguinte.
+    Ex: data em 2000-10 -> safra '00/01'
+        data em 2001-01 -> safra '00/01'
+    """
+    return safra_from_year_month(d.year, d.month)
+
+def dates_to_safra(datas):
+    """
+    Versão vetorizada de `date_to_safra` para uma Series de datas.
+    Os pares (ano, mês) são codificados como inteiros e apenas os pares distintos
+    passam por `safra_from_year_month` (O(pares) em vez de O(linhas)).
+    """
+    chaves = datas.dt.year.to_numpy().astype(np.int64) * 100 + datas.dt.month.to_numpy()
+    chaves_unicas, codigos = np.unique(chaves, return_inverse=True)
+    rotulos = np.array(
+        [safra_from_year_month(c // 100, c % 100) for c in chaves_unicas.tolist()],
+        dtype=object
+    )
+    return pd.Series(rotulos[codigos], index=datas.index)
+
+def lookup_join(left, right, keys):
+    """
+    Equivalente a `pd.merge(left, right, on=keys, how='left')` quando as chaves de `right`
+    são únicas: as colunas de `right` são buscadas por `reindex` no índice das chaves,
+    sem construir a tabela hash e o índice de saída do merge. A ordem das linhas de
+    `left` é preservada e colunas repetidas assumem os valores de `right`.
+    """
+    lookup = right.set_index(keys)
+    if not lookup.index.is_unique:
+        logging.warning(f"Chaves duplicadas em {keys}; mantendo a primeira ocorrência.")
+        lookup = lookup[~lookup.index.duplicated(keep='first')]
+
+    values = lookup.reindex(pd.MultiIndex.from_frame(left[keys]))
+    values.index = left.index
+    return left.assign(**{col: values[col] for col in values.columns})
+
+def partial_agg_dict(agg_dict):
+    """
+    Converte as regras de agregação finais em estatísticas parciais que podem ser
+    reagregadas: 'mean' vira soma e contagem, 'sum' e 'first' são mantidas.
+    """
+    return {
+        col: ['sum', 'count'] if how == 'mean' else [how]
+        for col, how in agg_dict.items()
+    }
+
+def finalize_aggregation(stats, agg_dict, dtypes):
+    """
+    Monta a tabela agregada final a partir das estatísticas parciais de `partial_agg_dict`,
+    preservando a ordem das colunas e os tipos da base diária.
+    """
+    df_agg = pd.DataFrame(index=stats.index)
+    for col, how in agg_dict.items():
+        if how == 'mean':
+            df_agg[col] = (stats[(col, 'sum')] / stats[(col, 'count')]).astype(dtypes[col])
+        else:
+            df_agg[col] = stats[(col, how)]
+    return df_agg.reset_index()
+
 def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municipios_interesse):
     """
     Junta os dados e cria os datasets mestres (diário, mensal, anual).
@@ -60,40 +116,49 @@ def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municip
     logging.info("Iniciando a criação dos datasets mestres...")
 
     try:
-        # 1. Carregar bases pré-processadas
-        df_clima = pd.read_csv(clima_path)
-        df_ndvi = pd.read_csv(ndvi_path)
-        df_prod = pd.read_csv(prod_path)
-        logging.info("Arquivos de clima, NDVI e produtividade carregados.")
+        # 1. Carregar bases pré-processadas (Parquet preserva datas e tipos)
+        # O filtro pelos municípios de interesse e a seleção de colunas são aplicados
+        # na própria leitura, então linhas e colunas descartadas nunca são materializadas.
+        municipios = sorted(frozenset(municipios_interesse))
+        df_clima = pd.read_parquet(clima_path, filters=[('Municipio', 'in', municipios)])
+        df_ndvi = pd.read_parquet(
+            ndvi_path,
+            columns=['data', 'valor', 'municipio'],
+            filters=[('municipio', 'in', municipios)]
+        )
+        df_prod = pd.read_parquet(prod_path, filters=[('municipio', 'in', municipios)])
+        logging.info(f"Dados filtrados na leitura. Clima: {len(df_clima)}, NDVI: {len(df_ndvi)}, Produção: {len(df_prod)} linhas.")
     except FileNotFoundError as e:
         logging.error(f"Erro ao carregar arquivos de entrada: {e}")
         return
 
     # --- Preparação e Padronização ---
-    # Clima: renomear colunas e converter data
+    # Os nomes dos municípios já chegam padronizados das etapas 01-03.
+    # Clima: renomear colunas (a data já vem convertida da etapa 03)
     df_clima.rename(columns={'Data': 'data', 'Municipio': 'municipio'}, inplace=True)
-    df_clima['data'] = pd.to_datetime(df_clima['data'], errors='coerce')
     df_clima.dropna(subset=['data'], inplace=True)
-    df_clima['municipio'] = df_clima['municipio'].str.strip()
 
-    # NDVI: converter data
-    df_ndvi['data'] = pd.to_datetime(df_ndvi['data'], errors='coerce')
+    # NDVI: descartar datas inválidas (convertidas para NaT na etapa 01)
     df_ndvi.dropna(subset=['data'], inplace=True)
-    df_ndvi['municipio'] = df_ndvi['municipio'].str.strip()
-
-    # Produção: garantir que 'municipio' está limpo
-    df_prod['municipio'] = df_prod['municipio'].str.strip()
 
     # 2. Mapear data para SAFRA
-    df_clima['SAFRA'] = df_clima['data'].apply(date_to_safra)
-    df_ndvi['SAFRA'] = df_ndvi['data'].apply(date_to_safra)
+    df_clima['SAFRA'] = dates_to_safra(df_clima['data'])
+    df_ndvi['SAFRA'] = dates_to_safra(df_ndvi['data'])
     logging.info("Coluna 'SAFRA' criada para dados de clima e NDVI.")
 
-    # 3. Filtrar todos os dataframes pelos municípios de interesse
-    df_clima = df_clima[df_clima['municipio'].isin(municipios_interesse)].copy()
-    df_ndvi = df_ndvi[df_ndvi['municipio'].isin(municipios_interesse)].copy()
-    df_prod = df_prod[df_prod['municipio'].isin(municipios_interesse)].copy()
-    logging.info(f"Dataframes filtrados. Clima: {len(df_clima)}, NDVI: {len(df_ndvi)}, Produção: {len(df_prod)} linhas.")
+    # 3. Converter as chaves de junção/agrupamento para categóricas.
+    # As categorias são compartilhadas entre os dataframes para que as junções
+    # comparem apenas os códigos inteiros, e ordenadas para preservar a ordem de saída.
+    municipio_dtype = pd.CategoricalDtype(municipios)
+    safra_dtype = pd.CategoricalDtype(sorted(
+        set(df_clima['SAFRA']) | set(df_ndvi['SAFRA']) | set(df_prod['SAFRA'])
+    ))
+    for df in (df_clima, df_ndvi, df_prod):
+        df['municipio'] = df['municipio'].astype(municipio_dtype)
+        df['SAFRA'] = df['SAFRA'].astype(safra_dtype)
+    for df, col in ((df_clima, 'Solo'), (df_prod, 'REGIAO')):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
 
     # --- Criação do Dataset Diário ---
     logging.info("Iniciando junção para o dataset diário...")
@@ -103,7 +168,7 @@ def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municip
     df_ndvi['mes'] = df_ndvi['data'].dt.month
     df_ndvi_mensal = (
         df_ndvi
-        .groupby(['municipio', 'SAFRA', 'ano', 'mes'], as_index=False)['valor']
+        .groupby(['municipio', 'SAFRA', 'ano', 'mes'], as_index=False, observed=True)['valor']
         .mean()
         .rename(columns={'valor': 'NDVI'})
     )
@@ -111,29 +176,11 @@ def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municip
     # 5. Juntar clima diário com NDVI mensal
     df_clima['ano'] = df_clima['data'].dt.year
     df_clima['mes'] = df_clima['data'].dt.month
-    df_daily = pd.merge(
-        df_clima,
-        df_ndvi_mensal,
-        on=['municipio', 'SAFRA', 'ano', 'mes'],
-        how='left'
-    )
+    df_daily = lookup_join(df_clima, df_ndvi_mensal, ['municipio', 'SAFRA', 'ano', 'mes'])
 
     # 6. Juntar com dados de produção (anuais por safra)
-    df_daily = pd.merge(
-        df_daily,
-        df_prod,
-        on=['SAFRA', 'municipio'],
-        how='left',
-        suffixes=('', '_prod') # Adiciona sufixo para colunas duplicadas como REGIAO, Solo
-    )
-    # Se houver colunas duplicadas, priorizar as do df_prod que são anuais
-    if 'REGIAO_prod' in df_daily.columns:
-        df_daily['REGIAO'] = df_daily['REGIAO_prod']
-        df_daily.drop(columns=['REGIAO_prod', 'REGIAO_x'], errors='ignore', inplace=True)
-    if 'Solo_prod' in df_daily.columns:
-        df_daily['Solo'] = df_daily['Solo_prod']
-        df_daily.drop(columns=['Solo_prod', 'Solo_x'], errors='ignore', inplace=True)
-
+    # Colunas presentes nos dois lados (ex: REGIAO, Solo) ficam com os valores de df_prod, que são anuais
+    df_daily = lookup_join(df_daily, df_prod, ['SAFRA', 'municipio'])
 
     # 7. Limpeza final do dataset diário
     # Manter apenas linhas onde temos dados de NDVI e Produção
@@ -142,8 +189,8 @@ def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municip
     logging.info(f"Dataset diário criado com {len(df_daily)} linhas.")
 
     # Salvar dataset diário
-    daily_out = os.path.join(output_dir, 'master_diario.csv')
-    df_daily.to_csv(daily_out, index=False)
+    daily_out = os.path.join(output_dir, 'master_diario.parquet')
+    df_daily.to_parquet(daily_out, compression='zstd', index=False)
     logging.info(f"Dataset diário salvo em: {daily_out}")
 
     # --- Criação dos Datasets Agregados ---
@@ -154,34 +201,38 @@ def create_master_datasets(clima_path, ndvi_path, prod_path, output_dir, municip
     # Garantir que as colunas existem antes de agregar
     climate_cols = [col for col in climate_cols if col in df_daily.columns]
 
+    # Regras de agregação (ex: 'sum' para chuva, 'mean' para temperatura)
+    agg_dict = {c: 'mean' for c in climate_cols}
+    agg_dict['Chuva (mm)'] = 'sum'
+    agg_dict['NDVI'] = 'mean'
+    agg_dict['AREA TOTAL'] = 'first'
+    agg_dict['PRODUCAO'] = 'first'
+    agg_dict['YIELD_SC_HA'] = 'first'
+    dtypes = df_daily.dtypes
+
     # 8. Criar tabela MENSAL
+    # A base diária é varrida uma única vez: as médias são guardadas como soma e
+    # contagem para que a tabela anual seja derivada das estatísticas mensais.
     logging.info("Criando dataset mensal...")
     group_cols_m = ['municipio', 'SAFRA', 'ano', 'mes', 'REGIAO', 'Solo']
-    agg_dict_m = {c: 'mean' for c in climate_cols}
-    agg_dict_m['Chuva (mm)'] = 'sum'
-    agg_dict_m['NDVI'] = 'mean'
-    agg_dict_m['AREA TOTAL'] = 'first'
-    agg_dict_m['PRODUCAO'] = 'first'
-    agg_dict_m['YIELD_SC_HA'] = 'first'
-
-    df_monthly = df_daily.groupby(group_cols_m, as_index=False).agg(agg_dict_m)
-    monthly_out = os.path.join(output_dir, 'master_mensal.csv')
-    df_monthly.to_csv(monthly_out, index=False)
+    stats_m = df_daily.groupby(group_cols_m, observed=True).agg(partial_agg_dict(agg_dict))
+
+    df_monthly = finalize_aggregation(stats_m, agg_dict, dtypes)
+    monthly_out = os.path.join(output_dir, 'master_mensal.parquet')
+    df_monthly.to_parquet(monthly_out, compression='zstd', index=False)
     logging.info(f"Dataset mensal salvo em: {monthly_out}")
 
-    # 9. Criar tabela ANUAL (por SAFRA)
+    # 9. Criar tabela ANUAL (por SAFRA) a partir das estatísticas mensais
+    # Somar somas e contagens mensais equivale a agregar os valores diários.
     logging.info("Criando dataset anual...")
     group_cols_a = ['municipio', 'SAFRA', 'REGIAO', 'Solo']
-    agg_dict_a = {c: 'mean' for c in climate_cols}
-    agg_dict_a['Chuva (mm)'] = 'sum'
-    agg_dict_a['NDVI'] = 'mean'
-    agg_dict_a['AREA TOTAL'] = 'first'
-    agg_dict_a['PRODUCAO'] = 'first'
-    agg_dict_a['YIELD_SC_HA'] = 'first'
-
-    df_annual = df_daily.groupby(group_cols_a, as_index=False).agg(agg_dict_a)
-    annual_out = os.path.join(output_dir, 'master_anual.csv')
-    df_annual.to_csv(annual_out, index=False)
+    stats_a = stats_m.groupby(level=group_cols_a, observed=True).agg(
+        {(col, stat): ('first' if stat == 'first' else 'sum') for col, stat in stats_m.columns}
+    )
+
+    df_annual = finalize_aggregation(stats_a, agg_dict, dtypes)
+    annual_out = os.path.join(output_dir, 'master_anual.parquet')
+    df_annual.to_parquet(annual_out, compression='zstd', index=False)
     logging.info(f"Dataset anual salvo em: {annual_out}")
 
 
@@ -19,82 +19,197 @@ Passos executados:
 """
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 import logging
+from log_setup import setup as setup_logging
+import math
 import os
+from concurrent.futures import ProcessPoolExecutor
+from numba import njit, prange, set_num_threads
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
+
+@njit(parallel=True, cache=True)
+def agronomic_kernel(tmax, tmin, tmed, ur, ndvi, rs,
+                     out_gdd, out_vpd, out_tq, out_dt, out_nq, out_nrs):
+    """
+    Calcula em uma única passada as features escalares por linha
+    (GDD, VPD, termos polinomiais e NDVI x RS), sem arrays temporários.
+    Valores NaN de entrada se propagam para as saídas, como no cálculo com pandas.
+    """
+    for i in prange(tmax.shape[0]):
+        # GDD base 10°C para soja
+        gdd = (tmax[i] + tmin[i]) / 2 - 10.0
+        out_gdd[i] = 0.0 if gdd < 0.0 else gdd
+
+        es = 0.6108 * math.exp((17.27 * tmed[i]) / (tmed[i] + 237.3))
+        vpd = es * (1.0 - ur[i] / 100.0)
+        out_vpd[i] = 0.0 if vpd < 0.0 else vpd
+
+        out_tq[i] = tmed[i] * tmed[i]
+        desvio = tmed[i] - 24.0 # Temp ótima ~24°C
+        out_dt[i] = desvio * desvio
+        out_nq[i] = ndvi[i] * ndvi[i]
+        out_nrs[i] = ndvi[i] * rs[i]
+
+def compute_scalar_features(df):
+    """
+    Executa `agronomic_kernel` sobre as colunas do dataframe e devolve um dicionário
+    com as features calculadas. Features cujas colunas de origem não existem são omitidas.
+    """
+    n = len(df)
+    def column(name):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=np.float32)
+        return np.full(n, np.nan, dtype=np.float32)
+
+    outputs = {name: np.empty(n, dtype=np.float32) for name in
+               ['GDD', 'VPD', 'Tmed_Quadrado', 'Desvio_Temp_Otima', 'NDVI_Quadrado', 'NDVI_x_RS']}
+    agronomic_kernel(
+        column('Tmax (°C)'), column('Tmin (°C)'), column('Tmed (°C)'),
+        column('UR (%)'), column('NDVI'), column('RS (MJ/m²d)'),
+        *outputs.values()
+    )
+
+    required = {
+        'GDD': ['Tmax (°C)', 'Tmin (°C)'],
+        'VPD': ['Tmed (°C)', 'UR (%)'],
+        'Tmed_Quadrado': ['Tmed (°C)'],
+        'Desvio_Temp_Otima': ['Tmed (°C)'],
+        'NDVI_Quadrado': ['NDVI'],
+        'NDVI_x_RS': ['NDVI', 'RS (MJ/m²d)'],
+    }
+    return {
+        name: values for name, values in outputs.items()
+        if all(col in df.columns for col in required[name])
+    }
+
+@njit(parallel=True, cache=True)
+def grouped_moving_sums(values, starts, ends, windows, min_periods):
+    """
+    Somas móveis de `values` dentro de cada grupo contíguo [starts[g], ends[g]),
+    para várias janelas de uma vez, com a mesma semântica de
+    `rolling(window, min_periods).sum()` do pandas (NaNs ignorados; NaN quando há
+    menos de `min_periods` valores na janela).
+
+    Cada grupo calcula uma única soma acumulada (prefix sum) e cada janela é obtida
+    pela diferença cs[i] - cs[i - w], reaproveitando a soma acumulada entre janelas.
+    Devolve um array (len(windows), len(values)) em float32.
+    """
+    n = values.shape[0]
+    out = np.empty((windows.shape[0], n), dtype=np.float32)
+    csum = np.empty(n)
+    ccount = np.empty(n, dtype=np.int64)
+    for g in prange(starts.shape[0]):
+        start, end = starts[g], ends[g]
+        acc = 0.0
+        count = 0
+        for i in range(start, end):
+            v = values[i]
+            if v == v:
+                acc += v
+                count += 1
+            csum[i] = acc
+            ccount[i] = count
+        for k in range(windows.shape[0]):
+            for i in range(start, end):
+                window_sum = csum[i]
+                window_count = ccount[i]
+                j = i - windows[k]
+                if j >= start:
+                    window_sum -= csum[j]
+                    window_count -= ccount[j]
+                out[k, i] = window_sum if window_count >= min_periods[k] else np.nan
+    return out
+
+def group_bounds(grouped):
+    """
+    Início e fim (exclusivo) de cada grupo de um groupby cujas linhas estão
+    contíguas, isto é, com o dataframe já ordenado pelas chaves do agrupamento.
+    """
+    ids = grouped.ngroup().to_numpy()
+    changes = np.flatnonzero(np.diff(ids)) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [len(ids)]))
+    return starts, ends
 
 def add_agronomic_features(df, is_daily=False):
     """
     Adiciona um conjunto rico de features agronômicas a um dataframe.
     O dataframe deve estar ordenado por município e data.
     """
-    df_out = df.copy()
+    # Cópia rasa: as colunas novas ou substituídas (ex: 'Chuva (mm)' sem NaNs) recebem
+    # arrays próprios, então os dados de `df` não são duplicados nem alterados.
+    df_out = df.copy(deep=False)
 
     # --- 1. Features Agronômicas Básicas ---
     logging.info("Calculando features agronômicas básicas (GDD, VPD)...")
-    if 'Tmax (°C)' in df_out.columns and 'Tmin (°C)' in df_out.columns:
-        tmean = (df_out['Tmax (°C)'] + df_out['Tmin (°C)']) / 2
-        df_out['GDD'] = (tmean - 10).clip(lower=0)  # GDD base 10°C para soja
-
-    if 'Tmed (°C)' in df_out.columns and 'UR (%)' in df_out.columns:
-        tmed = df_out['Tmed (°C)']
-        ur = df_out['UR (%)']
-        es = 0.6108 * np.exp((17.27 * tmed) / (tmed + 237.3))
-        df_out['VPD'] = (es * (1 - ur / 100)).clip(lower=0)
+    # As features escalares (básicas e polinomiais) são calculadas de uma vez pelo
+    # kernel compilado; as colunas são inseridas nas etapas correspondentes abaixo.
+    scalar_features = compute_scalar_features(df_out)
+    for name in ['GDD', 'VPD']:
+        if name in scalar_features:
+            df_out[name] = scalar_features[name]
 
     # --- 2. Features de Janela Móvel (Apenas para dados diários/mensais) ---
     if is_daily:
         logging.info("Calculando features de janela móvel (acumulados e estresse)...")
-        # Garantir que não há NaNs nas colunas base
-        df_out['Chuva (mm)'] = df_out['Chuva (mm)'].fillna(0)
-        df_out['GDD'] = df_out['GDD'].fillna(0)
-        df_out['Tmax (°C)'] = df_out['Tmax (°C)'].fillna(df_out['Tmed (°C)']) # Fallback
-
-        # Agrupar por município e safra para calcular janelas móveis corretamente
-        grouped = df_out.groupby(['municipio', 'SAFRA'])
-
-        for window in [30, 60, 90]:
-            df_out[f'Chuva_Acum_{window}d'] = grouped['Chuva (mm)'].transform(
-                lambda x: x.rolling(window, min_periods=window//2).sum()
-            )
-            if 'GDD' in df_out.columns:
-                df_out[f'GDD_Acum_{window}d'] = grouped['GDD'].transform(
-                    lambda x: x.rolling(window, min_periods=window//2).sum()
-                )
+        # Garantir que não há NaNs nas colunas base. A coluna só é substituída
+        # quando há NaNs (raro após o dropna da etapa 04), evitando cópias à toa.
+        if df_out['Chuva (mm)'].hasnans:
+            df_out['Chuva (mm)'] = df_out['Chuva (mm)'].fillna(0)
+        if df_out['GDD'].hasnans:
+            df_out['GDD'] = df_out['GDD'].fillna(0)
+        if df_out['Tmax (°C)'].hasnans:
+            df_out['Tmax (°C)'] = df_out['Tmax (°C)'].fillna(df_out['Tmed (°C)']) # Fallback
 
-        # Features de Estresse
-        df_out['Heat_Stress_Flag'] = (df_out['Tmax (°C)'] > 34).astype(int)
-        df_out['Heat_Stress_30d'] = grouped['Heat_Stress_Flag'].transform(
-            lambda x: x.rolling(30, min_periods=15).sum()
+        # Agrupar por município e safra para calcular janelas móveis corretamente.
+        # Como o dataframe está ordenado, cada grupo é um bloco contíguo de linhas.
+        grouped = df_out.groupby(['municipio', 'SAFRA'], observed=True, sort=False)
+        starts, ends = group_bounds(grouped)
+
+        windows = np.array([30, 60, 90])
+        chuva_acum = grouped_moving_sums(
+            df_out['Chuva (mm)'].to_numpy(), starts, ends, windows, windows // 2
         )
-        df_out['Dry_Day_Flag'] = (df_out['Chuva (mm)'] < 1).astype(int)
-        df_out['Dry_Days_30d'] = grouped['Dry_Day_Flag'].transform(
-            lambda x: x.rolling(30, min_periods=15).sum()
+        gdd_acum = grouped_moving_sums(
+            df_out['GDD'].to_numpy(), starts, ends, windows, windows // 2
         )
+        for k, window in enumerate(windows):
+            df_out[f'Chuva_Acum_{window}d'] = chuva_acum[k]
+            df_out[f'GDD_Acum_{window}d'] = gdd_acum[k]
+
+        # Features de Estresse
+        # As flags são arrays uint8 somados diretamente pelo kernel de soma móvel
+        stress_window, stress_min_periods = np.array([30]), np.array([15])
+        heat_flag = (df_out['Tmax (°C)'].to_numpy() > 34).astype(np.uint8)
+        df_out['Heat_Stress_Flag'] = heat_flag
+        df_out['Heat_Stress_30d'] = grouped_moving_sums(
+            heat_flag, starts, ends, stress_window, stress_min_periods
+        )[0]
+        dry_flag = (df_out['Chuva (mm)'].to_numpy() < 1).astype(np.uint8)
+        df_out['Dry_Day_Flag'] = dry_flag
+        df_out['Dry_Days_30d'] = grouped_moving_sums(
+            dry_flag, starts, ends, stress_window, stress_min_periods
+        )[0]
 
     # --- 3. Features de Sinergia e Polinomiais ---
     logging.info("Calculando features de sinergia e polinomiais...")
     if 'NDVI' in df_out.columns:
-        if 'RS (MJ/m²d)' in df_out.columns:
-            df_out['NDVI_x_RS'] = df_out['NDVI'] * df_out['RS (MJ/m²d)']
+        if 'NDVI_x_RS' in scalar_features:
+            df_out['NDVI_x_RS'] = scalar_features['NDVI_x_RS']
         if 'Chuva_Acum_90d' in df_out.columns:
             df_out['NDVI_x_Chuva_90d'] = df_out['NDVI'] * df_out['Chuva_Acum_90d']
         if 'GDD_Acum_90d' in df_out.columns:
             df_out['NDVI_x_GDD_90d'] = df_out['NDVI'] * df_out['GDD_Acum_90d']
-        df_out['NDVI_Quadrado'] = df_out['NDVI'] ** 2
+        df_out['NDVI_Quadrado'] = scalar_features['NDVI_Quadrado']
 
     if 'Tmed (°C)' in df_out.columns:
-        df_out['Tmed_Quadrado'] = df_out['Tmed (°C)'] ** 2
-        df_out['Desvio_Temp_Otima'] = (df_out['Tmed (°C)'] - 24) ** 2 # Temp ótima ~24°C
+        df_out['Tmed_Quadrado'] = scalar_features['Tmed_Quadrado']
+        df_out['Desvio_Temp_Otima'] = scalar_features['Desvio_Temp_Otima']
 
     # --- 4. Features de Defasagem (Lag) ---
     logging.info("Calculando features de defasagem (ano anterior)...")
@@ -106,41 +221,41 @@ def add_agronomic_features(df, is_daily=False):
         agg_dict_lag['NDVI'] = 'mean'
 
     if agg_dict_lag:
-        df_safra_avg = df.groupby(['municipio', 'SAFRA']).agg(agg_dict_lag).reset_index()
-        
+        # Agregado por (município, safra); o groupby já devolve o índice ordenado
+        df_safra_avg = df.groupby(['municipio', 'SAFRA'], observed=True).agg(agg_dict_lag)
+
         # Renomear colunas para nomes mais descritivos
         rename_map = {
             'Chuva (mm)': 'Chuva_Total_Safra',
             'NDVI': 'NDVI_Medio_Safra'
         }
         df_safra_avg.rename(columns=rename_map, inplace=True)
-        
-        df_safra_avg = df_safra_avg.sort_values(by=['municipio', 'SAFRA'])
-
-        # Criar colunas de lag
-        lag_cols = list(rename_map.values())
-        for col in lag_cols:
-            df_safra_avg[f'{col}_Anterior'] = df_safra_avg.groupby('municipio')[col].shift(1)
-
-        # Juntar com o dataframe de saída
-        merge_cols = ['municipio', 'SAFRA'] + [f'{c}_Anterior' for c in lag_cols]
-        df_out = pd.merge(
-            df_out,
-            df_safra_avg[merge_cols],
-            on=['municipio', 'SAFRA'],
-            how='left'
+
+        # Criar colunas de lag (safra anterior do mesmo município)
+        df_lag = (
+            df_safra_avg
+            .groupby(level='municipio', observed=True)
+            .shift(1)
+            .add_suffix('_Anterior')
         )
 
+        # Juntar com o dataframe de saída pelo índice (município, safra)
+        df_out = df_out.join(df_lag, on=['municipio', 'SAFRA'])
+
     return df_out
 
 
-def process_dataset(input_path, output_path):
+def process_dataset(input_path, output_path, n_threads=None):
     """
     Carrega um dataset mestre, aplica a engenharia de features e salva o resultado.
+    Com `n_threads`, os kernels paralelos do numba usam no máximo esse número de threads.
     """
+    if n_threads is not None:
+        set_num_threads(n_threads)
     logging.info(f"Iniciando engenharia de features para: {input_path}")
     try:
-        df = pd.read_csv(input_path)
+        # Parquet preserva os tipos da etapa 04 (datas, categóricas, float32)
+        df = pd.read_parquet(input_path)
     except FileNotFoundError:
         logging.error(f"Arquivo não encontrado: {input_path}")
         return
@@ -148,7 +263,6 @@ def process_dataset(input_path, output_path):
     # Ordenar os dados para garantir consistência nos cálculos de janela
     sort_cols = ['municipio', 'SAFRA']
     if 'data' in df.columns:
-        df['data'] = pd.to_datetime(df['data'])
         sort_cols.append('data')
     elif 'mes' in df.columns:
         sort_cols.append('ano')
@@ -164,7 +278,17 @@ def process_dataset(input_path, output_path):
     # Salvar o arquivo final
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_featured.to_csv(output_path, index=False)
+        table = pa.Table.from_pandas(df_featured, preserve_index=False)
+        if output_path.endswith('.parquet'):
+            # Parquet preserva os tipos (float32, categóricas) para as etapas de modelagem
+            pq.write_table(table, output_path, compression='zstd')
+        else:
+            # Escritor CSV nativo (C++, multi-thread) do Arrow em vez do escritor Python do pandas
+            if 'data' in table.column_names:
+                # Datas diárias sem hora, no mesmo formato 'YYYY-MM-DD' que o pandas escreveria
+                idx = table.column_names.index('data')
+                table = table.set_column(idx, 'data', table.column('data').cast(pa.date32()))
+            pv.write_csv(table, output_path, write_options=pv.WriteOptions(batch_size=65536))
         logging.info(f"Dataset com features salvo em: {output_path}")
     except Exception as e:
         logging.error(f"Falha ao salvar o arquivo em {output_path}: {e}")
@@ -184,6 +308,14 @@ if __name__ == '__main__':
         "anual": (config.MASTER_ANUAL_PATH, config.FEATURES_ANUAL_PATH),
     }
 
-    # Processar cada um dos datasets mestres
-    for name, (input_path, output_path) in datasets_to_process.items():
-        process_dataset(input_path, output_path)
+    # Os três datasets são independentes: processá-los em paralelo, um processo por dataset.
+    # Apenas os caminhos (strings) são enviados aos processos filhos, que dividem os
+    # núcleos entre si para que os kernels do numba não disputem a CPU.
+    n_threads = max(1, (os.cpu_count() or 1) // len(datasets_to_process))
+    with ProcessPoolExecutor(max_workers=len(datasets_to_process)) as executor:
+        futures = {
+            name: executor.submit(process_dataset, input_path, output_path, n_threads)
+            for name, (input_path, output_path) in datasets_to_process.items()
+        }
+        for name, future in futures.items():
+            future.result()
@@ -23,100 +23,144 @@ import tensorflow as tf
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Input, LSTM, Dense, Masking, Dropout, Bidirectional, Flatten
 from tensorflow.keras.callbacks import EarlyStopping
-from sklearn.preprocessing import MinMaxScaler
+from tensorflow.keras import mixed_precision
+from sklearn.preprocessing import OrdinalEncoder
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.model_selection import RandomizedSearchCV
+from sklearn.model_selection import KFold
+import optuna
 import os
+import hashlib
 import logging
+from log_setup import setup as setup_logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Importar configurações
 import config
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 
-def get_feature_list():
-    """Monta a lista de features a partir do config."""
-    return (
-        config.BASE_FEATURES + config.AGRONOMIC_FEATURES + config.STRESS_FEATURES +
-        config.ACCUMULATED_FEATURES + config.INTERACTION_FEATURES +
-        config.POLYNOMIAL_FEATURES + config.LAG_FEATURES
-    )
+# O progresso de cada trial do Optuna não é registrado, apenas o resultado final da busca
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+# Codificador das features estáticas, compartilhado entre as granularidades (ver get_static_encoder)
+_STATIC_ENCODER = None
+
+_GPU_AVAILABLE = bool(tf.config.list_physical_devices('GPU'))
+
+# Dispositivo do XGBoost: usar a GPU (CUDA) quando disponível
+_XGB_DEVICE = "cuda" if _GPU_AVAILABLE else "cpu"
 
-def train_hybrid_model(df, granularity):
+# Na GPU, a LSTM usa precisão mista (cálculos em float16, pesos em float32).
+# Na CPU não há ganho, então a política padrão (float32) é mantida.
+if _GPU_AVAILABLE:
+    mixed_precision.set_global_policy('mixed_float16')
+
+# Versão do cache de modelos: incrementar sempre que o pré-processamento, o tensor de
+# entrada ou o treinamento mudarem, invalidando os modelos salvos por versões anteriores
+CACHE_VERSION = 2
+
+# Lista completa de features temporais, montada uma única vez a partir do config
+ALL_FEATURES = tuple(
+    config.BASE_FEATURES + config.AGRONOMIC_FEATURES + config.STRESS_FEATURES +
+    config.ACCUMULATED_FEATURES + config.INTERACTION_FEATURES +
+    config.POLYNOMIAL_FEATURES + config.LAG_FEATURES
+)
+
+def xgb_native_params(params, n_jobs):
     """
-    Treina e avalia o modelo híbrido LSTM-XGBoost.
+    Converte parâmetros no formato do XGBRegressor (config.XGB_TUNING_PARAMS) para a
+    API nativa (`xgb.train`). Retorna o dicionário do booster e o número de rodadas.
     """
-    logging.info(f"--- Iniciando Treinamento Híbrido para Granularidade: {granularity} ---")
-
-    # --- 1. Preparação dos Dados ---
-    lstm_params = config.LSTM_PARAMS[granularity.upper()]
-    max_timesteps = lstm_params['max_timesteps']
+    booster_params = {k: v for k, v in params.items() if k != 'n_estimators'}
+    booster_params.update({
+        'objective': 'reg:squarederror',
+        'eval_metric': 'rmse',
+        'tree_method': 'hist',
+        'device': _XGB_DEVICE,
+        'nthread': n_jobs,
+        'seed': 42
+    })
+    return booster_params, params['n_estimators']
+
+def make_cv_folds(X, y, n_folds, feature_names=None):
+    """
+    Constrói uma única vez os pares (treino, validação) de QuantileDMatrix de cada fold.
+    A matriz de validação usa os cortes do histograma da matriz de treino (`ref`).
+    """
+    folds = []
+    kfold = KFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for train_idx, val_idx in kfold.split(X):
+        dtrain = xgb.QuantileDMatrix(X[train_idx], label=y[train_idx], feature_names=feature_names)
+        dval = xgb.QuantileDMatrix(X[val_idx], label=y[val_idx], ref=dtrain, feature_names=feature_names)
+        folds.append((dtrain, dval))
+    return folds
+
+def get_static_encoder(df, static_features):
+    """
+    Retorna o OrdinalEncoder das features estáticas, ajustado uma única vez sobre
+    todos os valores do primeiro dataset. As categorias são ordenadas, então o mesmo
+    valor recebe sempre o mesmo código, em qualquer granularidade; valores não vistos
+    recebem -1.
+    """
+    global _STATIC_ENCODER
+    if _STATIC_ENCODER is None or list(_STATIC_ENCODER.feature_names_in_) != list(static_features):
+        _STATIC_ENCODER = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
+        _STATIC_ENCODER.fit(df[static_features].astype(str))
+    return _STATIC_ENCODER
+
+def read_features(path):
+    """Carrega um dataset de features em Parquet ou, como alternativa, em CSV."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, engine='pyarrow')
+    return pd.read_csv(path, engine='pyarrow')
+
+def build_sequence_tensor(df, values, max_timesteps):
+    """
+    Monta o tensor 3D (grupos, timesteps, features) com uma sequência por
+    (município, safra), na ordem ordenada dos grupos. `values` é a matriz
+    (linhas de `df`, features) que preenche o tensor; de `df` são usadas apenas
+    as chaves de grupo.
+
+    As linhas são agrupadas por uma ordenação estável dos ids de grupo e a posição
+    de cada linha dentro do seu grupo é obtida por aritmética de offsets, de modo
+    que o tensor é preenchido por uma única atribuição com indexação avançada.
+    Sequências maiores que `max_timesteps` são truncadas e as menores ficam
+    completadas com zeros (valor usado pela camada de Masking).
+
+    Returns:
+        tuple: (X_seq, first_rows), onde `first_rows` são as posições da primeira
+        linha de cada grupo em `df`.
+    """
+    group_ids = df.groupby(['municipio', 'SAFRA'], sort=True, observed=True).ngroup().to_numpy()
+    n_groups = group_ids.max() + 1 if len(group_ids) else 0
 
-    all_features = get_feature_list()
-    temporal_features = [f for f in all_features if f in df.columns]
-    static_features = [f for f in config.STATIC_FEATURES if f in df.columns]
+    # Linhas com chave nula não pertencem a nenhum grupo (id -1)
+    order = np.argsort(group_ids, kind='stable')
+    order = order[group_ids[order] >= 0]
+    ids_sorted = group_ids[order]
 
-    logging.info(f"Features temporais utilizadas ({len(temporal_features)}): {temporal_features}")
+    sizes = np.bincount(ids_sorted, minlength=n_groups)
+    starts = np.cumsum(sizes) - sizes
+    within_group_idx = np.arange(len(order)) - np.repeat(starts, sizes)
+    keep = within_group_idx < max_timesteps
 
-    # Normalização das features temporais
-    scaler = MinMaxScaler()
-    df[temporal_features] = scaler.fit_transform(df[temporal_features].fillna(0))
+    # Cópia direta das linhas mantidas para o tensor pré-zerado, sem materializações intermediárias
+    X_seq = np.zeros((n_groups, max_timesteps, values.shape[1]), dtype=np.float32)
+    X_seq[ids_sorted[keep], within_group_idx[keep]] = values[order[keep]]
 
-    # --- 2. Construção do Tensor 3D para LSTM ---
-    logging.info(f"Construindo tensor 3D com janela de {max_timesteps} timesteps...")
-    sequencias, targets, metadata = [], [], []
-    
-    # Agrupar por safra e município para criar as sequências
-    for (muni, safra), group in df.groupby(['municipio', 'SAFRA']):
-        # Extrair sequência de features temporais
-        seq = group[temporal_features].values
-        
-        # Padding ou truncamento
-        if len(seq) > max_timesteps:
-            seq = seq[:max_timesteps]
-        else:
-            seq = np.pad(seq, ((0, max_timesteps - len(seq)), (0, 0)), mode='constant')
-        
-        sequencias.append(seq)
-        targets.append(group[config.TARGET_COLUMN].iloc[0])
-        
-        # Coletar metadados (features estáticas e identificadores)
-        meta_row = {
-            'municipio': muni,
-            'SAFRA': safra,
-            'is_test': 1 if safra == config.TEST_SAFRA else 0,
-            'AREA_TOTAL': group['AREA TOTAL'].iloc[0],
-            'PRODUCAO_REAL': group['PRODUCAO'].iloc[0]
-        }
-        for feat in static_features:
-            meta_row[feat] = group[feat].iloc[0]
-        metadata.append(meta_row)
-
-    X_seq = np.array(sequencias)
-    y = np.array(targets)
-    df_meta = pd.DataFrame(metadata)
+    first_rows = order[starts]
+    return X_seq, first_rows
 
-    # --- 3. Treinamento da LSTM como Extrator de Features ---
+def train_lstm(X_train_nn, y_train_nn, lstm_params, max_timesteps, n_features):
+    """
+    Constrói e treina a LSTM (ou a rede densa, no caso ANUAL) usada como extratora de embeddings.
+    """
     logging.info("Treinando a LSTM para extração de embeddings...")
-    
-    # Split para treino da LSTM
-    train_mask = df_meta['is_test'] == 0
-    X_train_nn, y_train_nn = X_seq[train_mask], y[train_mask]
-
-    if len(X_train_nn) == 0:
-        logging.error("Não há dados de treino para a LSTM. Abortando.")
-        return None
 
     # Construção do modelo LSTM
-    input_layer = Input(shape=(max_timesteps, len(temporal_features)))
+    input_layer = Input(shape=(max_timesteps, n_features))
     masked = Masking(mask_value=0.0)(input_layer)
     
     if lstm_params['lstm_units'] > 0:
@@ -129,79 +173,253 @@ def train_hybrid_model(df, granularity):
         x = Flatten()(masked)
         x = Dense(64, activation='relu')(x)
 
-    embedding_layer = Dense(config.LSTM_PARAMS['embedding_size'], activation='relu', name='embedding_layer')(x)
-    output_layer = Dense(1, activation='linear')(embedding_layer)
+    # Embeddings e saída em float32: os embeddings alimentam o XGBoost e a loss é calculada em precisão completa
+    embedding_layer = Dense(config.LSTM_PARAMS['embedding_size'], activation='relu', name='embedding_layer', dtype='float32')(x)
+    output_layer = Dense(1, activation='linear', dtype='float32')(embedding_layer)
 
     model_nn = Model(inputs=input_layer, outputs=output_layer)
     model_nn.compile(optimizer='adam', loss='mse')
 
+    # Lotes maiores na GPU para ocupar o dispositivo
+    batch_size = config.LSTM_PARAMS['batch_size_gpu'] if _GPU_AVAILABLE else config.LSTM_PARAMS['batch_size']
+    # Pipeline tf.data: embaralhamento a cada época e prefetch, que prepara o próximo
+    # lote (e sua cópia para o dispositivo) enquanto o lote atual é processado
+    ds_train = (
+        tf.data.Dataset.from_tensor_slices((X_train_nn, y_train_nn))
+        .shuffle(len(y_train_nn), reshuffle_each_iteration=True)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
     es = EarlyStopping(monitor='loss', patience=config.LSTM_PARAMS['patience'], restore_best_weights=True)
-    model_nn.fit(X_train_nn, y_train_nn, epochs=config.LSTM_PARAMS['epochs'], batch_size=config.LSTM_PARAMS['batch_size'], verbose=0, callbacks=[es])
+    model_nn.fit(ds_train, epochs=config.LSTM_PARAMS['epochs'], shuffle=False, verbose=0, callbacks=[es])
+
+    return model_nn
+
+def tune_and_train_xgb(X_train, y_train, xgb_features, n_jobs=-1):
+    """
+    Busca os hiperparâmetros do XGBoost e treina o modelo final com os melhores.
+    """
+    # Tuning do XGBoost com Optuna e validação cruzada pela API nativa: as matrizes
+    # quantizadas de cada fold são construídas uma única vez e reutilizadas por todos
+    # os trials. Trials pouco promissores são interrompidos (pruning) entre os folds.
+    folds = make_cv_folds(X_train, y_train, config.CV_FOLDS, xgb_features)
+
+    def objective(trial):
+        params = {k: trial.suggest_categorical(k, v) for k, v in config.XGB_TUNING_PARAMS.items()}
+        booster_params, num_boost_round = xgb_native_params(params, n_jobs)
+        rmses, rounds = [], []
+        for step, (dtrain_fold, dval_fold) in enumerate(folds):
+            booster = xgb.train(
+                booster_params, dtrain_fold,
+                num_boost_round=num_boost_round,
+                evals=[(dval_fold, 'val')],
+                early_stopping_rounds=20,
+                verbose_eval=False
+            )
+            rmses.append(booster.best_score)
+            rounds.append(booster.best_iteration + 1)
+            trial.report(float(np.mean(rmses)), step=step)
+            if trial.should_prune():
+                raise optuna.TrialPruned(f"Trial interrompido após o fold {step + 1}.")
+        # Número de rodadas do modelo final: média das rodadas ótimas dos folds
+        trial.set_user_attr('num_boost_round', int(np.mean(rounds)))
+        return float(np.mean(rmses))
+
+    study = optuna.create_study(
+        direction='minimize',
+        sampler=optuna.samplers.TPESampler(seed=42),
+        pruner=optuna.pruners.MedianPruner(n_warmup_steps=1)
+    )
+    study.optimize(objective, n_trials=config.N_ITER_SEARCH)
+    logging.info(f"Melhores parâmetros para o XGBoost: {study.best_params}")
+
+    # Modelo final treinado com os melhores parâmetros em todo o conjunto de treino
+    booster_params, _ = xgb_native_params(study.best_params, n_jobs)
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train, feature_names=xgb_features)
+    best_xgb = xgb.train(
+        booster_params, dtrain,
+        num_boost_round=study.best_trial.user_attrs['num_boost_round']
+    )
+
+    return best_xgb
+
+def model_cache_key(path):
+    """
+    Chave do cache de modelos: hash do arquivo de features combinado com o hash
+    dos parâmetros de configuração que influenciam o treinamento, da versão do
+    código (CACHE_VERSION) e da política de precisão ativa (float32 ou mixed_float16).
+    """
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(block)
+    params = (
+        CACHE_VERSION, mixed_precision.global_policy().name,
+        list(ALL_FEATURES), config.STATIC_FEATURES, config.TARGET_COLUMN, config.TEST_SAFRA,
+        config.LSTM_PARAMS, config.XGB_TUNING_PARAMS, config.N_ITER_SEARCH, config.CV_FOLDS
+    )
+    config_hash = hashlib.md5(repr(params).encode()).hexdigest()
+    return file_hash.hexdigest()[:16] + config_hash[:8]
+
+def model_cache_paths(granularity, cache_key):
+    """Caminhos da LSTM (.keras) e do XGBoost (.json) em cache para uma granularidade."""
+    return (
+        os.path.join(config.MODELS_DIR, f'lstm_{granularity}_{cache_key}.keras'),
+        os.path.join(config.MODELS_DIR, f'xgb_{granularity}_{cache_key}.json')
+    )
+
+def train_hybrid_model(df, granularity, n_jobs=-1, cache_key=None):
+    """
+    Treina e avalia o modelo híbrido LSTM-XGBoost.
+    `n_jobs` limita as threads do XGBoost e da busca de hiperparâmetros na CPU.
+    Com `cache_key`, os modelos são salvos em MODELS_DIR e reutilizados (sem novo
+    treinamento) enquanto o arquivo de features e a configuração não mudarem.
+    """
+    logging.info(f"--- Iniciando Treinamento Híbrido para Granularidade: {granularity} ---")
+
+    # --- 1. Preparação dos Dados ---
+    lstm_params = config.LSTM_PARAMS[granularity.upper()]
+    max_timesteps = lstm_params['max_timesteps']
+
+    temporal_features = [f for f in ALL_FEATURES if f in df.columns]
+    static_features = [f for f in config.STATIC_FEATURES if f in df.columns]
+
+    logging.info(f"Features temporais utilizadas ({len(temporal_features)}): {temporal_features}")
+
+    # Normalização min-max das features temporais, feita in-place em um único bloco float32.
+    # Os limites ignoram os valores ausentes (fmin/fmax), que são preenchidos com 0 só depois
+    # da escala, na mesma passada. Obs.: 0 também é o valor de Masking da LSTM, então um
+    # timestep cujas features estejam todas no mínimo (ou ausentes) é tratado como padding.
+    arr = df[temporal_features].to_numpy(dtype=np.float32, copy=True)
+    mn = np.nan_to_num(np.fmin.reduce(arr, axis=0))  # Colunas inteiramente ausentes: limites 0
+    mx = np.nan_to_num(np.fmax.reduce(arr, axis=0))
+    rng = np.where(mx > mn, mx - mn, 1.0).astype(np.float32)  # Features constantes não são escaladas
+    arr -= mn
+    arr /= rng
+    np.nan_to_num(arr, copy=False)
+
+    # --- 2. Construção do Tensor 3D para LSTM ---
+    logging.info(f"Construindo tensor 3D com janela de {max_timesteps} timesteps...")
+    # Uma sequência por (município, safra), truncada ou completada com zeros até max_timesteps.
+    # O bloco normalizado é usado diretamente, sem ser copiado de volta para o DataFrame.
+    X_seq, first_rows = build_sequence_tensor(df, arr, max_timesteps)
+    del arr
+
+    # Metadados (features estáticas e identificadores) da primeira linha de cada grupo,
+    # coletados com um único `take` restrito às colunas necessárias
+    meta_cols = list(dict.fromkeys(
+        ['municipio', 'SAFRA', 'AREA TOTAL', 'PRODUCAO', config.TARGET_COLUMN] + static_features
+    ))
+    df_meta = df[meta_cols].take(first_rows).reset_index(drop=True)
+    # Alvo convertido uma única vez para float32, o mesmo tipo do tensor e dos embeddings
+    y = df_meta.pop(config.TARGET_COLUMN).to_numpy(dtype=np.float32)
+    df_meta.rename(columns={'AREA TOTAL': 'AREA_TOTAL', 'PRODUCAO': 'PRODUCAO_REAL'}, inplace=True)
+    df_meta.insert(2, 'is_test', (df_meta['SAFRA'] == config.TEST_SAFRA).to_numpy().astype(np.int8))
+
+    # --- 3. Treinamento da LSTM como Extrator de Features ---
+    # Split para treino da LSTM
+    train_mask = df_meta['is_test'].to_numpy() == 0
+    X_train_nn = np.ascontiguousarray(X_seq[train_mask], dtype=np.float32)
+    y_train_nn = y[train_mask]
+
+    if len(X_train_nn) == 0:
+        logging.error("Não há dados de treino para a LSTM. Abortando.")
+        return None
+
+    lstm_path, xgb_path = model_cache_paths(granularity, cache_key)
+    cached = cache_key is not None and os.path.exists(lstm_path) and os.path.exists(xgb_path)
+    if cached:
+        logging.info(f"Modelos em cache encontrados para {granularity} ({cache_key}); pulando o treinamento.")
+        model_nn = tf.keras.models.load_model(lstm_path)
+    else:
+        model_nn = train_lstm(X_train_nn, y_train_nn, lstm_params, max_timesteps, len(temporal_features))
 
     # --- 4. Extração de Embeddings e Construção do Dataset Final para XGBoost ---
     logging.info("Extraindo embeddings e construindo dataset para o XGBoost.")
     
     # Usar a LSTM treinada para extrair os embeddings de todos os dados (treino e teste)
     extractor = Model(inputs=model_nn.input, outputs=model_nn.get_layer('embedding_layer').output)
-    embeddings = extractor.predict(X_seq)
-    df_emb = pd.DataFrame(embeddings, columns=[f'emb_{i}' for i in range(config.LSTM_PARAMS['embedding_size'])])
-
-    # Juntar metadados, features estáticas e embeddings
-    df_xgb = pd.concat([df_meta.reset_index(drop=True), df_emb.reset_index(drop=True)], axis=1)
 
-    # Adicionar a coluna alvo ao dataframe antes de fazer o split
-    df_xgb[config.TARGET_COLUMN] = y
-
-    # Codificar features categóricas
-    for col in config.STATIC_FEATURES:
-        if col in df_xgb.columns:
-            df_xgb[col] = df_xgb[col].astype('category').cat.codes
+    # Passo de inferência em grafo, executado uma única vez sobre o tensor inteiro (uma
+    # cópia para o dispositivo e um único traço, em vez de um por formato de lote).
+    # Na CPU o grafo é compilado com XLA (LSTM + Dense fundidos); na GPU não, pois a
+    # LSTM usa o kernel cuDNN, que o XLA não consegue compilar.
+    @tf.function(jit_compile=not _GPU_AVAILABLE)
+    def extract(x):
+        return extractor(x, training=False)
+
+    embeddings = extract(tf.constant(X_seq)).numpy()
+
+    # Matriz de entrada do XGBoost montada diretamente em NumPy: embeddings seguidos
+    # das features estáticas codificadas (mapeamento único valor -> código para treino e teste)
+    emb_size = config.LSTM_PARAMS['embedding_size']
+    X_full = np.empty((len(df_meta), emb_size + len(static_features)), dtype=np.float32)
+    X_full[:, :emb_size] = embeddings
+    if static_features:
+        encoder = get_static_encoder(df, static_features)
+        X_full[:, emb_size:] = encoder.transform(df_meta[static_features].astype(str))
+    xgb_features = [f'emb_{i}' for i in range(emb_size)] + static_features
 
     # --- 5. Treinamento e Avaliação do XGBoost ---
     logging.info("Treinando e avaliando o modelo XGBoost final.")
-    
+
     # Split final
-    df_train = df_xgb[df_xgb['is_test'] == 0]
-    df_test = df_xgb[df_xgb['is_test'] == 1]
+    is_test = df_meta['is_test'].to_numpy() == 1
+    X_train, y_train = X_full[~is_test], y[~is_test]
+    X_test, y_test = X_full[is_test], y[is_test]
 
-    if df_train.empty or df_test.empty:
+    if len(X_train) == 0 or len(X_test) == 0:
         logging.warning("Dados de treino ou teste para o XGBoost estão vazios.")
         return None
 
-    xgb_features = [f'emb_{i}' for i in range(config.LSTM_PARAMS['embedding_size'])] + [col for col in config.STATIC_FEATURES if col in df_xgb.columns]
-    
-    X_train = df_train[xgb_features]
-    y_train = df_train[config.TARGET_COLUMN]
-    X_test = df_test[xgb_features]
-    y_test = df_test[config.TARGET_COLUMN]
-
-    # Tuning e treinamento do XGBoost
-    xgb_model = xgb.XGBRegressor(random_state=42, n_jobs=-1)
-    random_search = RandomizedSearchCV(
-        xgb_model,
-        param_distributions=config.XGB_TUNING_PARAMS,
-        n_iter=config.N_ITER_SEARCH,
-        scoring='neg_mean_squared_error',
-        cv=config.CV_FOLDS,
-        verbose=1,
-        random_state=42,
-        n_jobs=-1
-    )
-    random_search.fit(X_train, y_train)
-    best_xgb = random_search.best_estimator_
-    logging.info(f"Melhores parâmetros para o XGBoost: {random_search.best_params_}")
+    if cached:
+        best_xgb = xgb.Booster()
+        best_xgb.load_model(xgb_path)
+    else:
+        best_xgb = tune_and_train_xgb(X_train, y_train, xgb_features, n_jobs=n_jobs)
+        if cache_key is not None:
+            model_nn.save(lstm_path)
+            best_xgb.save_model(xgb_path)
 
     # Avaliação
-    y_pred = best_xgb.predict(X_test)
+    y_pred = best_xgb.inplace_predict(X_test)
     r2 = r2_score(y_test, y_pred)
     rmse = np.sqrt(mean_squared_error(y_test, y_pred))
 
     logging.info(f"Resultados para {granularity} (Híbrido): R² = {r2:.4f}, RMSE = {rmse:.4f} sc/ha")
 
-    # TODO: Salvar modelo e resultados
+    # TODO: Salvar resultados
     
     return {'r2': r2, 'rmse': rmse, 'model': best_xgb, 'features': xgb_features}
 
+def run_granularity(granularity, path, n_jobs=-1):
+    """
+    Carrega o dataset de features de uma granularidade e executa o pipeline híbrido.
+    Com `n_jobs` > 0, o processo usa no máximo `n_jobs` threads no TensorFlow e no XGBoost.
+    Retorna o dicionário de resultados ou None em caso de falha.
+    """
+    if n_jobs > 0:
+        # Limita também as threads do TensorFlow (antes de qualquer operação), para que
+        # os processos paralelos não disputem todos os núcleos entre si
+        tf.config.threading.set_intra_op_parallelism_threads(n_jobs)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    try:
+        df = read_features(path)
+        # A linha abaixo era redundante e foi removida.
+        # O arquivo de features já contém a coluna alvo.
+        df.dropna(subset=[config.TARGET_COLUMN], inplace=True)
+
+        # TODO: Adicionar chamada para um modelo XGBoost puro como baseline
+
+        # Executar o pipeline de modelo híbrido
+        return train_hybrid_model(df, granularity, n_jobs=n_jobs, cache_key=model_cache_key(path))
+
+    except FileNotFoundError:
+        logging.error(f"Arquivo de features não encontrado para {granularity}: {path}")
+    except Exception as e:
+        logging.error(f"Ocorreu um erro ao processar a granularidade {granularity}: {e}")
+    return None
+
 
 if __name__ == '__main__':
     # Criar diretórios de resultados se não existirem
@@ -216,24 +434,26 @@ if __name__ == '__main__':
     }
 
     results = {}
-    for granularity, path in feature_paths.items():
-        try:
-            df = pd.read_csv(path)
-            # A linha abaixo era redundante e foi removida.
-            # O arquivo de features já contém a coluna alvo.
-            df.dropna(subset=[config.TARGET_COLUMN], inplace=True)
-
-            # Executar o pipeline de modelo híbrido
-            result = train_hybrid_model(df, granularity)
+    if _GPU_AVAILABLE:
+        # Na GPU as granularidades são treinadas em sequência, compartilhando o dispositivo
+        for granularity, path in feature_paths.items():
+            result = run_granularity(granularity, path)
             if result:
                 results[f'hibrido_{granularity}'] = result
-
-            # TODO: Adicionar chamada para um modelo XGBoost puro como baseline
-
-        except FileNotFoundError:
-            logging.error(f"Arquivo de features não encontrado para {granularity}: {path}")
-        except Exception as e:
-            logging.error(f"Ocorreu um erro ao processar a granularidade {granularity}: {e}")
+    else:
+        # Na CPU as três granularidades são independentes e rodam em processos separados,
+        # dividindo os núcleos entre si. 'spawn' evita herdar o runtime do TensorFlow via fork;
+        # cada processo reconfigura o logging ao importar o módulo.
+        n_jobs = max(1, (os.cpu_count() or 1) // len(feature_paths))
+        with ProcessPoolExecutor(max_workers=len(feature_paths), mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                granularity: executor.submit(run_granularity, granularity, path, n_jobs)
+                for granularity, path in feature_paths.items()
+            }
+            for granularity, future in futures.items():
+                result = future.result()
+                if result:
+                    results[f'hibrido_{granularity}'] = result
 
     logging.info("\n--- RESUMO FINAL DOS RESULTADOS ---")
     for model_name, metrics in results.items():
@@ -12,20 +12,20 @@ import numpy as np
 import joblib # Para carregar modelos salvos
 import shap
 import os
+import re
 import logging
+from log_setup import LOG_FILE, setup as setup_logging
 
 # Importar configurações
 import config
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
+
+# Marcador da seção de resumo escrita pelo script 06
+SUMMARY_MARKER = "--- RESUMO FINAL DOS RESULTADOS ---"
+# Linha de resultado: "... - INFO - hibrido_mensal       | R²: 0.3811 | RMSE: 9.4316 sc/ha"
+SUMMARY_LINE_PATTERN = re.compile(r'INFO - (\S+)\s*\|\s*R²:\s*([-+\w.]+)\s*\|\s*RMSE:\s*([-+\w.]+)')
 
 def generate_report_text(results):
     """
@@ -74,7 +74,7 @@ def generate_report_text(results):
         "   - **LSTM como Extrator de Features:** A LSTM foi treinada nos dados sequenciais (diários/mensais) para gerar um vetor de características latentes ('embedding') que resume a dinâmica temporal da safra.\n"
         "   - **XGBoost como Modelo Final:** O XGBoost foi treinada usando uma combinação de features: (1) os embeddings da LSTM, (2) features estáticas (município, solo, região) e (3) metadados da safra.\n"
         "   - **Validação:** O modelo foi treinado em todas as safras disponíveis, exceto a safra '23/24', que foi usada como conjunto de teste para avaliar a performance em dados não vistos.\n"
-        "   - **Otimização:** O XGBoost foi otimizado usando `RandomizedSearchCV` para encontrar os melhores hiperparâmetros.\n\n"
+        "   - **Otimização:** O XGBoost foi otimizado com `Optuna` (amostrador TPE, com interrupção antecipada dos trials pouco promissores) para encontrar os melhores hiperparâmetros.\n\n"
     )
 
     # --- Seção 2: Discussão dos Resultados ---
@@ -108,7 +108,7 @@ def generate_report_text(results):
     report += "3.2. Crítica aos Parâmetros e Modelo:\n"
     report += (
         "   - **Modelo Híbrido:** A principal vantagem é a capacidade da LSTM de aprender padrões temporais complexos que o XGBoost sozinho não consegue. A desvantagem é a complexidade e o tempo de treinamento. A importância dos embeddings (acima) é a chave para justificar essa escolha.\n"
-        "   - **Hiperparâmetros:** O uso de `RandomizedSearchCV` é uma boa prática. No entanto, os resultados são sensíveis ao espaço de busca definido em `config.py`. Seria interessante analisar se os melhores parâmetros encontrados estão nos limites do espaço de busca, o que poderia indicar a necessidade de expandi-lo.\n"
+        "   - **Hiperparâmetros:** O uso de uma busca de hiperparâmetros com `Optuna` é uma boa prática. No entanto, os resultados são sensíveis ao espaço de busca definido em `config.py`. Seria interessante analisar se os melhores parâmetros encontrados estão nos limites do espaço de busca, o que poderia indicar a necessidade de expandi-lo.\n"
         "   - **Overfitting:** O uso de `EarlyStopping` na LSTM e a regularização (L1/L2) no XGBoost são medidas importantes contra o overfitting. A validação em um ano completamente separado também ajuda a ter uma estimativa mais realista da performance.\n\n"
     )
     report += "3.3. Limitações e Sugestões para Trabalhos Futuros:\n"
@@ -120,67 +120,76 @@ def generate_report_text(results):
 
     return report
 
+def read_lines_reversed(path, chunk_size=8192):
+    """
+    Gera as linhas de um arquivo de trás para frente, lendo blocos de `chunk_size`
+    bytes a partir do final (como o `tail`). A memória usada é limitada ao bloco
+    atual, independentemente do tamanho do arquivo.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            # A primeira linha do bloco pode estar incompleta: completar com o próximo bloco
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode('utf-8', errors='ignore')
+        yield remainder.decode('utf-8', errors='ignore')
+
 def parse_log_for_results(log_path):
     """
     Analisa o arquivo de log para extrair os resultados finais da última execução.
+    O log é lido de trás para frente e a leitura termina na última seção de resumo.
     """
+    summary_section_lines = []
+    found = False
     try:
-        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
+        for line in read_lines_reversed(log_path):
+            if SUMMARY_MARKER in line:
+                found = True
+                break
+            if "INFO" in line and "|" in line:
+                # Linha de tabela: pode pertencer ao bloco logo após o marcador
+                summary_section_lines.append(line)
+            else:
+                # A tabela de resumo é contígua ao marcador; descartar linhas de tabela soltas
+                summary_section_lines = []
     except FileNotFoundError:
         logging.error(f"Arquivo de log não encontrado em: {log_path}")
         return None
 
-    results = {}
-    summary_section_lines = []
-    capture = False
-
-    # Encontra a última seção de resumo no log
-    for line in lines:
-        if "--- RESUMO FINAL DOS RESULTADOS ---" in line:
-            # Nova seção de resumo encontrada, limpa a anterior para pegar apenas a última
-            summary_section_lines = []
-            capture = True
-            continue
-        
-        if capture and "INFO" in line and "|" in line:
-            summary_section_lines.append(line)
-        elif capture and ("INFO" not in line or "|" not in line):
-            # Se encontrar uma linha que não pertence à tabela de resumo, para de capturar
-            capture = False
-
     # Processa as linhas da última seção de resumo encontrada
-    if not summary_section_lines:
+    if not found or not summary_section_lines:
         return None
 
-    for line in summary_section_lines:
-        parts = line.split('|')
-        if len(parts) != 3: # Espera 3 partes: nome | R² | RMSE
-            continue
-
+    results = {}
+    for line in reversed(summary_section_lines):
+        match = SUMMARY_LINE_PATTERN.search(line)
         try:
-            # O nome do modelo é a primeira palavra após 'INFO -'
-            model_name = parts[0].split('INFO -')[1].strip().split()[0]
-            
-            # Extrai os valores de R² e RMSE de forma mais robusta
-            r2_val = float(parts[1].split(':')[1].strip())
-            rmse_val = float(parts[2].split(':')[1].split('sc/ha')[0].strip())
-            
-            results[model_name] = {
-                'r2': r2_val,
-                'rmse': rmse_val
-            }
-        except (IndexError, ValueError) as e:
+            if not match:
+                raise ValueError("formato inesperado")
+            model_name, r2_val, rmse_val = match.group(1), float(match.group(2)), float(match.group(3))
+        except ValueError as e:
             logging.warning(f"Não foi possível parsear a linha de resultado: {line.strip()} - Erro: {e}")
             continue
-            
+
+        results[model_name] = {
+            'r2': r2_val,
+            'rmse': rmse_val
+        }
+
     return results
 
 if __name__ == '__main__':
     logging.info("Iniciando a geração do relatório final...")
     
     # Analisa dinamicamente o log para obter os resultados mais recentes
-    log_file_path = 'execution.log'
+    log_file_path = LOG_FILE
     final_results = parse_log_for_results(log_file_path)
 
     if not final_results:
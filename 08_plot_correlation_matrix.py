@@ -8,23 +8,17 @@ entre as features mais importantes e a variável alvo.
 Utiliza o dataset mensal, que apresentou os melhores resultados de modelo.
 """
 import pandas as pd
-import seaborn as sns
+import numpy as np
 import matplotlib.pyplot as plt
 import os
 import logging
+from log_setup import setup as setup_logging
 
 # Importar configurações
 import config
 
 # Configuração do logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("execution.log", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging()
 
 def plot_correlation_matrix(data_path, output_path):
     """
@@ -33,7 +27,10 @@ def plot_correlation_matrix(data_path, output_path):
     logging.info(f"Gerando matriz de correlação para o arquivo: {data_path}")
 
     try:
-        df = pd.read_csv(data_path)
+        if data_path.endswith('.parquet'):
+            df = pd.read_parquet(data_path, engine='pyarrow')
+        else:
+            df = pd.read_csv(data_path, engine='pyarrow')
     except FileNotFoundError:
         logging.error(f"Arquivo de dados não encontrado: {data_path}")
         return
@@ -63,24 +60,39 @@ def plot_correlation_matrix(data_path, output_path):
         'NDVI_Medio_Safra_Anterior': 'NDVI Safra Ant.'
     }, inplace=True)
 
-    # Calcular a matriz de correlação
-    corr_matrix = df_subset.corr()
+    # Calcular a matriz de correlação (Pearson) com uma única chamada BLAS sobre uma matriz float32
+    arr = df_subset.to_numpy(dtype=np.float32)
+    if np.isnan(arr).any():
+        # Com valores ausentes, manter a correlação par a par (observações completas por par) do pandas
+        corr_matrix = df_subset.corr()
+    else:
+        corr = np.corrcoef(arr, rowvar=False)
+        corr_matrix = pd.DataFrame(corr, index=df_subset.columns, columns=df_subset.columns)
 
     # Gerar o gráfico (heatmap)
     plt.style.use('seaborn-v0_8-whitegrid')
     fig, ax = plt.subplots(figsize=(16, 12))
-    
-    heatmap = sns.heatmap(
-        corr_matrix,
-        annot=True,
-        fmt=".2f",
-        cmap='coolwarm',
-        linewidths=.5,
-        ax=ax,
-        vmin=-1,
-        vmax=1
-    )
-    
+
+    # Heatmap com imshow e um texto por célula (sem a camada do seaborn)
+    values = corr_matrix.to_numpy()
+    labels = list(corr_matrix.columns)
+    im = ax.imshow(values, cmap='coolwarm', vmin=-1, vmax=1, aspect='auto')
+    fig.colorbar(im, ax=ax)
+    for (i, j), v in np.ndenumerate(values):
+        ax.text(j, i, f'{v:.2f}', ha='center', va='center', fontsize=10,
+                color='white' if abs(v) > 0.5 else 'black')
+
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels)
+    ax.set_yticks(range(len(labels)))
+    ax.set_yticklabels(labels)
+    # Linhas brancas separando as células, no lugar da grade do estilo
+    ax.grid(False)
+    ax.set_xticks(np.arange(len(labels) + 1) - 0.5, minor=True)
+    ax.set_yticks(np.arange(len(labels) + 1) - 0.5, minor=True)
+    ax.grid(which='minor', color='white', linewidth=.5)
+    ax.tick_params(which='minor', length=0)
+
     ax.set_title('Matriz de Correlação - Features Mensais', fontsize=18)
     plt.xticks(rotation=45, ha='right')
     plt.yticks(rotation=0)
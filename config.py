@@ -28,19 +28,21 @@ CLIMATE_RAW_PATH = os.path.join(BASE_DATA_DIR, 'clima_PR_2000-2024_clean.csv')
 CLIMATE_FULL_RAW_PATH = os.path.join(BASE_DATA_DIR, 'dados_climaticos_parana_completo.csv')
 
 # Caminhos para arquivos processados (Etapas 01-03)
-NDVI_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'ndvi_filtrado.csv')
-YIELD_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'yield_calculado.csv')
-CLIMATE_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'clima_safra.csv')
+# Os arquivos intermediários são salvos em Parquet, que preserva os tipos das colunas
+# (datas, categóricas, float32) e evita reprocessar texto a cada etapa.
+NDVI_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'ndvi_filtrado.parquet')
+YIELD_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'yield_calculado.parquet')
+CLIMATE_PROCESSED_PATH = os.path.join(PROCESSED_DATA_DIR, 'clima_safra.parquet')
 
 # Caminhos para datasets mestres (Etapa 04)
-MASTER_DIARIO_PATH = os.path.join(MASTER_DATA_DIR, 'master_diario.csv')
-MASTER_MENSAL_PATH = os.path.join(MASTER_DATA_DIR, 'master_mensal.csv')
-MASTER_ANUAL_PATH = os.path.join(MASTER_DATA_DIR, 'master_anual.csv')
+MASTER_DIARIO_PATH = os.path.join(MASTER_DATA_DIR, 'master_diario.parquet')
+MASTER_MENSAL_PATH = os.path.join(MASTER_DATA_DIR, 'master_mensal.parquet')
+MASTER_ANUAL_PATH = os.path.join(MASTER_DATA_DIR, 'master_anual.parquet')
 
 # Caminhos para datasets com features (Etapa 05)
-FEATURES_DIARIO_PATH = os.path.join(FEATURES_DATA_DIR, 'features_diario.csv')
-FEATURES_MENSAL_PATH = os.path.join(FEATURES_DATA_DIR, 'features_mensal.csv')
-FEATURES_ANUAL_PATH = os.path.join(FEATURES_DATA_DIR, 'features_anual.csv')
+FEATURES_DIARIO_PATH = os.path.join(FEATURES_DATA_DIR, 'features_diario.parquet')
+FEATURES_MENSAL_PATH = os.path.join(FEATURES_DATA_DIR, 'features_mensal.parquet')
+FEATURES_ANUAL_PATH = os.path.join(FEATURES_DATA_DIR, 'features_anual.parquet')
 
 
 # --- 2. PARÂMETROS GERAIS ---
@@ -119,10 +121,11 @@ LSTM_PARAMS = {
     'embedding_size': 32,
     'epochs': 100,
     'batch_size': 16,
+    'batch_size_gpu': 128, # Lotes maiores quando a LSTM roda na GPU (precisão mista)
     'patience': 15
 }
 
-# Espaço de busca para o RandomizedSearchCV do XGBoost
+# Espaço de busca para o tuning do XGBoost (Optuna)
 XGB_TUNING_PARAMS = {
     'n_estimators': [100, 200, 300, 500],
     'learning_rate': [0.01, 0.05, 0.1],
@@ -134,7 +137,7 @@ XGB_TUNING_PARAMS = {
     'reg_lambda': [1, 1.5, 2]
 }
 
-# Número de iterações para o RandomizedSearchCV
+# Número de trials do Optuna
 N_ITER_SEARCH = 25
 CV_FOLDS = 5 # Folds para a validação cruzada do tuning
 
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+io_utils.py
+
+Funções de leitura compartilhadas pelos scripts de preparação (01, 02 e 03).
+
+Os arquivos brutos são lidos com o leitor CSV do Arrow, que mapeia o arquivo
+em memória e divide o trabalho de parsing entre várias threads, em vez do
+leitor do pandas. O resultado é convertido para um DataFrame com tipos numpy
+comuns, para que as etapas seguintes (pandas/numba) não precisem de ajustes.
+"""
+import csv
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# Tamanho de cada bloco processado por thread pelo leitor do Arrow
+CSV_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Tipo Arrow que resulta em uma coluna categórica no pandas
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+
+def read_csv_header(path):
+    """
+    Retorna a lista de colunas do cabeçalho de um arquivo CSV. Um BOM UTF-8 no início
+    do arquivo é descartado, como faz o leitor do Arrow.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+
+def read_csv_typed(path, schema=None, usecols=None, parse_dates=(), decimal_point='.'):
+    """
+    Lê um arquivo CSV com o leitor multi-thread do Arrow e o converte para pandas.
+
+    Args:
+        path (str): Caminho para o arquivo CSV.
+        schema (dict): Mapeamento coluna -> tipo Arrow (ex: pa.float32(), CATEGORY).
+            Colunas fora do mapeamento têm o tipo inferido.
+        usecols (list): Colunas a serem lidas. Colunas ausentes no arquivo são
+            ignoradas (cabe ao chamador validá-las).
+        parse_dates (list): Colunas convertidas para datetime; valores inválidos viram NaT.
+        decimal_point (str): Separador decimal dos valores numéricos.
+
+    Returns:
+        pd.DataFrame: Dados lidos, com tipos numpy/categóricos.
+
+    Raises:
+        FileNotFoundError: Se o arquivo não existir.
+    """
+    include_columns = []
+    if usecols is not None:
+        wanted = frozenset(usecols)
+        include_columns = [col for col in read_csv_header(path) if col in wanted]
+
+    schema = dict(schema or {})
+    # As datas são lidas como texto e convertidas pelo pandas, que aceita valores inválidos
+    for col in parse_dates:
+        schema[col] = pa.string()
+
+    read_options = pv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE)
+    convert_options = pv.ConvertOptions(
+        column_types=schema,
+        include_columns=include_columns,
+        decimal_point=decimal_point
+    )
+    with pa.memory_map(path, 'r') as source:
+        table = pv.read_csv(source, read_options=read_options, convert_options=convert_options)
+
+    df = table.to_pandas()
+    for col in parse_dates:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def load_csv(path, **kwargs):
+    """
+    Lê um arquivo CSV com `read_csv_typed`, registrando no log o resultado.
+
+    Returns:
+        pd.DataFrame | None: Dados lidos, ou None se o arquivo não existir.
+    """
+    try:
+        df = read_csv_typed(path, **kwargs)
+    except FileNotFoundError:
+        logging.error(f"Arquivo de entrada não encontrado em: {path}")
+        return None
+    logging.info(f"Arquivo {path} carregado com {len(df)} linhas.")
+    return df
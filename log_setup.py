@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+log_setup.py
+
+Configuração de logging compartilhada pelos scripts do pipeline.
+"""
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_FILE = "execution.log"
+
+
+def setup():
+    """
+    Configura o logger raiz para registrar no arquivo `execution.log` e no console.
+    Idempotente: se o logger raiz já tiver handlers (ex: scripts importados por
+    outro script), nada é feito, evitando linhas de log duplicadas.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(LOG_FILE, mode='a'),
+            logging.StreamHandler()
+        ]
+    )